@@ -1,14 +1,19 @@
 from tools import TravelTool
+from deadline import deadline_scope
 from llama_index.agent.openai import OpenAIAgent
 from llama_index.llms.groq import Groq
 import os
 from dotenv import load_dotenv
 
 
+# Overall time budget for one agent turn, shared by every tool call it makes
+AGENT_TURN_TIMEOUT_SECONDS = 60
+
 tool = TravelTool()
 
 agent = OpenAIAgent.from_tools(tool.to_tool_list(), llm=Groq(model="qwen-qwq-32b", api_key=os.getenv("GROQ_API_KEY")))
 
-response = agent.chat("Search for flights between NYC and PAR on 2025-05-30")
+with deadline_scope(AGENT_TURN_TIMEOUT_SECONDS):
+    response = agent.chat("Search for flights between NYC and PAR on 2025-05-30")
 
 print(response)
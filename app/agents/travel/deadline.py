@@ -0,0 +1,72 @@
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the time budget of the current agent turn or tool call has run out"""
+
+
+class Deadline:
+    """Absolute point in time (monotonic clock) by which a unit of work must finish"""
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """Seconds left for a single blocking call, optionally capped; raises once expired"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Deadline exceeded")
+        return min(remaining, cap) if cap is not None else remaining
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("travel_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    Run the enclosed block under a time budget
+
+    Nested scopes can only shorten the enclosing deadline, so a tool call never outlives the
+    agent turn that made it. Passing `None` keeps the enclosing deadline unchanged.
+    """
+    parent = _current_deadline.get()
+    deadline = parent
+    if seconds is not None:
+        deadline = Deadline.after(seconds)
+        if parent is not None and parent.expires_at < deadline.expires_at:
+            deadline = parent
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def with_deadline(seconds: Optional[float]):
+    """Decorator running every call of the wrapped function inside `deadline_scope(seconds)`"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with deadline_scope(seconds):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
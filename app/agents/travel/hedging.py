@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, wait
+from typing import Callable, Optional, TypeVar
+
+from deadline import Deadline, DeadlineExceeded
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of recent successful request latencies"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency at percentile `p` (0-1), or None until enough samples have been seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class HedgeBudget:
+    """
+    Caps hedged attempts at a fraction of primary requests so hedging cannot burn the API quota
+
+    Also refuses to hedge once the provider reports fewer than `quota_reserve` requests left,
+    and keeps at most `max_in_flight` hedges running so they never queue in the hedge pool.
+    """
+
+    def __init__(self, max_ratio: float = 0.1, burst: int = 2, quota_reserve: int = 100, max_in_flight: int = 4):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.quota_reserve = quota_reserve
+        self.max_in_flight = max_in_flight
+        self.quota_remaining: Optional[int] = None
+        self._requests = 0
+        self._hedges = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.quota_remaining is not None and self.quota_remaining < self.quota_reserve:
+                return False
+            if self._hedges >= self.burst + self.max_ratio * self._requests:
+                return False
+            if self._in_flight >= self.max_in_flight:
+                return False
+            self._hedges += 1
+            self._in_flight += 1
+            return True
+
+    def release(self):
+        """Called when a hedged attempt finishes, win or lose"""
+        with self._lock:
+            self._in_flight -= 1
+
+
+def hedged_call(
+    attempt: Callable[[float], T],
+    executor: Executor,
+    deadline: Deadline,
+    hedge_delay: Optional[float] = None,
+    budget: Optional[HedgeBudget] = None,
+    per_attempt_timeout: Optional[float] = None,
+    hedge_executor: Optional[Executor] = None
+) -> T:
+    """
+    Run `attempt(timeout)` on `executor`, returning or raising no later than `deadline`
+
+    If `hedge_delay` and `budget` are given and the attempt hasn't answered after `hedge_delay`,
+    a second copy is raced on `hedge_executor`, so hedges never wait behind primary attempts.
+    The first attempt to succeed wins; the loser is left to finish within its own timeout.
+    Only hedge idempotent requests. Raises the last attempt's error if all attempts fail,
+    or `DeadlineExceeded` if none answers before the deadline.
+    """
+    # True until the single hedge has been sent (or skipped for lack of budget)
+    can_hedge = hedge_delay is not None and budget is not None
+    if can_hedge:
+        budget.record_request()
+    pending = {executor.submit(attempt, deadline.timeout(per_attempt_timeout))}
+    error: Optional[BaseException] = None
+
+    while pending:
+        wait_for = deadline.remaining()
+        if can_hedge:
+            wait_for = min(wait_for, hedge_delay)
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+
+        if deadline.expired():
+            raise DeadlineExceeded("Deadline exceeded waiting for upstream response")
+        if can_hedge and pending:
+            can_hedge = False
+            if budget.try_acquire():
+                hedge = (hedge_executor or executor).submit(attempt, deadline.timeout(per_attempt_timeout))
+                hedge.add_done_callback(lambda _: budget.release())
+                pending.add(hedge)
+
+    raise error
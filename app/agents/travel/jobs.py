@@ -0,0 +1,362 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# A RUNNING job whose lease isn't renewed within this time is considered abandoned
+LEASE_SECONDS = 30.0
+
+# Booking states no later job may move a booking out of
+TERMINAL_BOOKING_STATUSES = ("cancelled",)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_key TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    lease_expires_at REAL,
+    booking_id TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS ix_jobs_booking_id ON jobs (booking_id);
+CREATE TABLE IF NOT EXISTS bookings (
+    booking_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    details TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a job handler when retrying cannot help (bad input, rejected by provider)"""
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given number of failed attempts"""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)))
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    """
+    Durable SQLite-backed job queue shared by every worker thread and process using the same file
+
+    Jobs are deduplicated by `job_key`, so enqueueing the same work twice returns the
+    original job instead of running it again. The running count per provider is read
+    inside the claiming transaction, which makes concurrency caps hold across processes.
+    Jobs for the same booking run one at a time, in the order they were enqueued.
+
+    A claimed job holds a lease that its worker renews while it runs. Once a lease expires,
+    e.g. because the process died mid-job, the next `claim()` puts the job back in the queue.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_expires_at" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_expires_at REAL")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict,
+        job_key: str,
+        provider: str,
+        booking_id: Optional[str] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        requeue_failed: bool = False,
+        retire_terminal_booking: bool = False
+    ) -> Dict:
+        """
+        Insert a job unless one with the same key exists; returns the stored job either way
+
+        With `requeue_failed`, a job that already exhausted its retries is queued again with a
+        fresh attempt budget. Leave it off for periodic jobs whose key is meant to limit how
+        often they run, so a failing upstream isn't hit on every enqueue.
+
+        With `retire_terminal_booking`, an existing job whose booking has reached a terminal
+        state (e.g. cancelled) gives up its key, so the same request starts a new booking.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if retire_terminal_booking:
+                conn.execute(
+                    "UPDATE jobs SET job_key = job_key || ':' || id WHERE job_key = ? AND booking_id IN ("
+                    f"SELECT booking_id FROM bookings WHERE status IN ({','.join('?' * len(TERMINAL_BOOKING_STATUSES))}))",
+                    (job_key, *TERMINAL_BOOKING_STATUSES)
+                )
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, job_key, kind, provider, payload, status, max_attempts,"
+                " run_after, booking_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (uuid.uuid4().hex, job_key, kind, provider, json.dumps(payload), QUEUED, max_attempts,
+                 now, booking_id, now, now)
+            )
+            if requeue_failed:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = 0, run_after = ?, updated_at = ? WHERE job_key = ? AND status = ?",
+                    (QUEUED, now, now, job_key, FAILED)
+                )
+            row = conn.execute("SELECT * FROM jobs WHERE job_key = ?", (job_key,)).fetchone()
+        return _row_to_job(row)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def latest_for_booking(self, booking_id: str, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        query, args = "SELECT * FROM jobs WHERE booking_id = ?", [booking_id]
+        if kinds:
+            query += f" AND kind IN ({','.join('?' * len(kinds))})"
+            args.extend(kinds)
+        with self._connect() as conn:
+            row = conn.execute(query + " ORDER BY created_at DESC LIMIT 1", args).fetchone()
+        return _row_to_job(row) if row else None
+
+    def claim(self, provider_limits: Dict[str, int], default_limit: int = 1) -> Optional[Dict]:
+        """
+        Atomically move the next due job whose provider is under its cap to RUNNING
+
+        A job is skipped while another job for the same booking is running or was enqueued
+        before it and is still queued, so e.g. a cancellation never overtakes its booking.
+        Jobs with expired leases are requeued first (or failed, if that was their last attempt).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,"
+                " run_after = ?, lease_expires_at = NULL, error = ?, updated_at = ?"
+                " WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (FAILED, QUEUED, now, "Worker lease expired", now, RUNNING, now)
+            )
+            running = dict(conn.execute(
+                "SELECT provider, COUNT(*) FROM jobs WHERE status = ? GROUP BY provider", (RUNNING,)
+            ).fetchall())
+            saturated = [
+                provider for provider, count in running.items()
+                if count >= provider_limits.get(provider, default_limit)
+            ]
+            placeholders = ",".join("?" * len(saturated))
+            query = (
+                "SELECT * FROM jobs WHERE status = ? AND run_after <= ?"
+                " AND (booking_id IS NULL OR NOT EXISTS ("
+                "SELECT 1 FROM jobs AS other WHERE other.booking_id = jobs.booking_id AND other.id != jobs.id"
+                " AND (other.status = ? OR (other.status = ? AND other.created_at < jobs.created_at))))"
+            )
+            if saturated:
+                query += f" AND provider NOT IN ({placeholders})"
+            row = conn.execute(
+                query + " ORDER BY run_after LIMIT 1", (QUEUED, now, RUNNING, QUEUED, *saturated)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, now + self.lease_seconds, now, row["id"])
+            )
+        job = _row_to_job(row)
+        job["status"] = RUNNING
+        job["attempts"] += 1
+        return job
+
+    # Updates from a worker only apply while it still owns the job: a job requeued after its
+    # lease expired and claimed again has a higher attempt count.
+    _OWNED = f" WHERE id = ? AND status = '{RUNNING}' AND attempts = ?"
+
+    def renew_leases(self, jobs: List[Dict]):
+        """Extend the leases of jobs this worker is still running"""
+        now = time.time()
+        with self._transaction() as conn:
+            for job in jobs:
+                conn.execute(
+                    "UPDATE jobs SET lease_expires_at = ?" + self._OWNED,
+                    (now + self.lease_seconds, job["id"], job["attempts"])
+                )
+
+    def complete(self, job: Dict, result: Dict, booking_status: Optional[str] = None):
+        """
+        Mark a job succeeded and, for booking jobs, record the resulting booking state
+
+        A booking already in a terminal state (e.g. cancelled) keeps it.
+        """
+        now = time.time()
+        placeholders = ",".join("?" * len(TERMINAL_BOOKING_STATUSES))
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires_at = NULL, updated_at = ?"
+                + self._OWNED,
+                (SUCCEEDED, json.dumps(result, default=str), now, job["id"], job["attempts"])
+            ).rowcount
+            if updated and job["booking_id"] and booking_status:
+                conn.execute(
+                    "INSERT INTO bookings (booking_id, status, details, updated_at) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (booking_id) DO UPDATE SET status = excluded.status, details = excluded.details,"
+                    f" updated_at = excluded.updated_at WHERE bookings.status NOT IN ({placeholders})",
+                    (job["booking_id"], booking_status, json.dumps(result, default=str), now,
+                     *TERMINAL_BOOKING_STATUSES)
+                )
+
+    def fail(self, job: Dict, error: str, retry: bool = True):
+        """Reschedule a failed job with backoff, or mark it failed once attempts are exhausted"""
+        now = time.time()
+        if retry and job["attempts"] < job["max_attempts"]:
+            status, run_after = QUEUED, now + backoff_delay(job["attempts"])
+        else:
+            status, run_after = FAILED, job["run_after"]
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, run_after = ?, error = ?, lease_expires_at = NULL, updated_at = ?"
+                + self._OWNED,
+                (status, run_after, error, now, job["id"], job["attempts"])
+            )
+
+    def get_booking(self, booking_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM bookings WHERE booking_id = ?", (booking_id,)).fetchone()
+        if row is None:
+            return None
+        booking = dict(row)
+        booking["details"] = json.loads(booking["details"])
+        return booking
+
+
+class WorkerPool:
+    """
+    Background threads that claim jobs from a `JobQueue` and dispatch them by kind
+
+    A handler receives the job payload and returns `(result, booking_status)`. Raising
+    `PermanentJobError` fails the job immediately; any other exception is retried with backoff.
+    A heartbeat thread renews the leases of running jobs every third of the lease period.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, Callable[[Dict], tuple]],
+        size: int = 4,
+        provider_limits: Optional[Dict[str, int]] = None,
+        poll_interval: float = 0.5
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.size = size
+        self.provider_limits = provider_limits or {}
+        self.poll_interval = poll_interval
+        self._running: Dict[str, Dict] = {}
+        self._running_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopped.clear()
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"travel-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="travel-job-heartbeat", daemon=True)
+        heartbeat.start()
+        self._threads.append(heartbeat)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """Wake idle workers after enqueueing so new jobs don't wait for the next poll"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            job = self.queue.claim(self.provider_limits)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            with self._running_lock:
+                self._running[job["id"]] = job
+            try:
+                self._execute(job)
+            finally:
+                with self._running_lock:
+                    self._running.pop(job["id"], None)
+
+    def _heartbeat(self):
+        while not self._stopped.wait(self.queue.lease_seconds / 3):
+            with self._running_lock:
+                jobs = list(self._running.values())
+            if jobs:
+                self.queue.renew_leases(jobs)
+
+    def _execute(self, job: Dict):
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.fail(job, f"No handler for job kind '{job['kind']}'", retry=False)
+            return
+        try:
+            result, booking_status = handler(job["payload"])
+        except PermanentJobError as e:
+            self.queue.fail(job, str(e), retry=False)
+        except Exception as e:
+            self.queue.fail(job, f"{type(e).__name__}: {str(e)}")
+        else:
+            self.queue.complete(job, result, booking_status)
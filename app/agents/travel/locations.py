@@ -0,0 +1,259 @@
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, List, Optional, Set, Tuple
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "locations.json")
+
+# Entries returned from each trie node; autocomplete never needs more than this
+TRIE_NODE_LIMIT = 10
+# Fuzzy matches must share this fraction of trigrams and stay within this edit distance
+MIN_TRIGRAM_SIMILARITY = 0.3
+MAX_EDIT_DISTANCE = 2
+# Only the keys sharing the most trigrams with the query are checked with edit distance
+MAX_FUZZY_CANDIDATES = 8
+# Longer queries than any indexed name skip fuzzy matching so latency stays bounded
+MAX_FUZZY_QUERY_LENGTH = 64
+# Typos are corrected outside autocomplete only on long keys with a single candidate one edit away,
+# since the dataset is small and short names of missing cities sit close to unrelated ones
+TYPO_MIN_LENGTH = 8
+TYPO_MAX_EDIT_DISTANCE = 1
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse punctuation/whitespace to single spaces"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int = MAX_EDIT_DISTANCE) -> int:
+    """
+    Levenshtein distance with adjacent transpositions, capped at `limit + 1`
+
+    Only the diagonal band of width `limit` is computed, so the cost grows with
+    len(a) * limit rather than len(a) * len(b).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    prev_prev: List[int] = []
+    prev = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        cur = [over] * (len(b) + 1)
+        if i <= limit:
+            cur[0] = i
+        ca = a[i - 1]
+        for j in range(lo, hi + 1):
+            value = prev[j - 1] if ca == b[j - 1] else prev[j - 1] + 1
+            if prev[j] + 1 < value:
+                value = prev[j] + 1
+            if cur[j - 1] + 1 < value:
+                value = cur[j - 1] + 1
+            if value > 1 and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == b[j - 1] and prev_prev[j - 2] + 1 < value:
+                value = prev_prev[j - 2] + 1
+            cur[j] = value if value < over else over
+        if min(cur[lo - 1:hi + 1]) > limit:
+            return over
+        prev_prev, prev = prev, cur
+    return prev[-1]
+
+
+class Location:
+    __slots__ = ("id", "code", "name", "type", "country", "city", "aliases", "rank")
+
+    def __init__(self, id: int, entry: Dict):
+        self.id = id
+        self.code = entry["code"]
+        self.name = entry["name"]
+        self.type = entry["type"]
+        self.country = entry.get("country")
+        self.city = entry.get("city")
+        self.aliases = entry.get("aliases", [])
+        self.rank = entry.get("rank", 0)
+
+    def to_dict(self) -> Dict:
+        return {
+            "code": self.code,
+            "name": self.name,
+            "type": self.type,
+            "country": self.country,
+            "city": self.city,
+        }
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # Best-ranked location ids under this prefix, kept sorted so lookups don't have to walk the subtree
+        self.ids: List[int] = []
+
+
+class LocationIndex:
+    """
+    In-memory index over the bundled cities/airports/stations dataset
+
+    Exact names, aliases and codes are looked up in a dict, prefixes through a trie
+    whose nodes carry their top-ranked matches, and typos through a trigram index
+    verified with a bounded edit distance.
+    """
+
+    def __init__(self, entries: List[Dict]):
+        self.locations = [Location(i, entry) for i, entry in enumerate(entries)]
+        self.city_by_code = {loc.code: loc for loc in self.locations if loc.type == "city"}
+        self._exact: Dict[str, List[int]] = {}
+        self._root = _TrieNode()
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._gram_counts: Dict[str, int] = {}
+
+        for loc in sorted(self.locations, key=lambda l: -l.rank):
+            for key in self._keys(loc):
+                ids = self._exact.setdefault(key, [])
+                if loc.id not in ids:
+                    ids.append(loc.id)
+                self._insert_prefixes(key, loc.id)
+                for word in key.split(" ")[1:]:
+                    self._insert_prefixes(word, loc.id)
+                grams = trigrams(key)
+                self._gram_counts[key] = len(grams)
+                for gram in grams:
+                    self._trigrams.setdefault(gram, set()).add(key)
+
+    @classmethod
+    def from_file(cls, path: str = DATA_PATH) -> "LocationIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _keys(loc: Location) -> Set[str]:
+        keys = {normalize(loc.name), normalize(loc.code)}
+        keys.update(normalize(alias) for alias in loc.aliases)
+        keys.discard("")
+        return keys
+
+    def _insert_prefixes(self, key: str, loc_id: int):
+        # Locations are inserted in rank order, so appending keeps each node's list sorted
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            if len(node.ids) < TRIE_NODE_LIMIT and loc_id not in node.ids:
+                node.ids.append(loc_id)
+
+    def _prefix_ids(self, prefix: str) -> List[int]:
+        node = self._root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        return node.ids
+
+    def _fuzzy_ids(self, key: str) -> List[int]:
+        grams = trigrams(key)
+        shared = Counter(chain.from_iterable(self._trigrams.get(gram, ()) for gram in grams))
+
+        candidates = sorted(
+            (count, candidate) for candidate, count in shared.items()
+            if abs(len(candidate) - len(key)) <= MAX_EDIT_DISTANCE
+        )[-MAX_FUZZY_CANDIDATES:]
+
+        scored: List[Tuple[int, float, int, int]] = []
+        for count, candidate in candidates:
+            similarity = count / (len(grams) + self._gram_counts[candidate] - count)
+            if similarity < MIN_TRIGRAM_SIMILARITY:
+                continue
+            distance = edit_distance(key, candidate)
+            if distance > MAX_EDIT_DISTANCE:
+                continue
+            for loc_id in self._exact[candidate]:
+                scored.append((distance, -similarity, -self.locations[loc_id].rank, loc_id))
+
+        ids: List[int] = []
+        for *_, loc_id in sorted(scored):
+            if loc_id not in ids:
+                ids.append(loc_id)
+        return ids
+
+    def autocomplete(self, query: str, limit: int = TRIE_NODE_LIMIT) -> List[Location]:
+        """Return up to `limit` locations for a partially typed query, falling back to fuzzy matches"""
+        key = normalize(query)
+        if not key:
+            return []
+        ids = list(self._prefix_ids(key)[:limit])
+        if len(ids) < limit and 3 <= len(key) <= MAX_FUZZY_QUERY_LENGTH:
+            for loc_id in self._fuzzy_ids(key):
+                if loc_id not in ids:
+                    ids.append(loc_id)
+                if len(ids) >= limit:
+                    break
+        return [self.locations[loc_id] for loc_id in ids]
+
+    def _typo_key(self, key: str) -> Optional[str]:
+        """The only indexed key within one edit of `key`, or None if there are zero or several"""
+        if len(key) < TYPO_MIN_LENGTH:
+            return None
+        candidates = {
+            candidate
+            for gram in trigrams(key)
+            for candidate in self._trigrams.get(gram, ())
+            if abs(len(candidate) - len(key)) <= TYPO_MAX_EDIT_DISTANCE
+        }
+        matches = [
+            candidate for candidate in candidates
+            if edit_distance(key, candidate, TYPO_MAX_EDIT_DISTANCE) <= TYPO_MAX_EDIT_DISTANCE
+        ]
+        return matches[0] if len(matches) == 1 else None
+
+    def lookup(self, query: str) -> Optional[Location]:
+        """
+        Resolve a complete name, alias or code to its location
+
+        Only exact matches and unambiguous single-character typos of long names resolve;
+        anything else returns None so callers pass the user's input through untouched.
+        """
+        key = normalize(query)
+        if not key:
+            return None
+        if key not in self._exact:
+            key = self._typo_key(key)
+        return self.locations[self._exact[key][0]] if key else None
+
+    def city_of(self, loc: Location) -> Location:
+        return self.city_by_code.get(loc.city, loc) if loc.city else loc
+
+    def canonicalize(self, query: str, mode: str = "ground") -> str:
+        """
+        Map free-form user input to the canonical value sent upstream
+
+        Args:
+            query: Location as typed by the user or the agent
+            mode: "flight" for IATA codes, "ground" for bus/train/cab place names
+
+        Returns:
+            Canonical code or name, or the stripped input if nothing matches
+        """
+        loc = self.lookup(query)
+        if loc is None:
+            return (query or "").strip()
+        if mode == "flight":
+            # Stations resolve to their city so the flight search covers all its airports
+            return loc.code if loc.type != "station" else self.city_of(loc).code
+        if loc.type == "airport":
+            return self.city_of(loc).name
+        return loc.name
+
+
+@lru_cache()
+def get_location_index() -> LocationIndex:
+    return LocationIndex.from_file()
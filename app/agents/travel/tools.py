@@ -2,14 +2,39 @@ from llama_index.core.tools.tool_spec.base import BaseToolSpec
 import requests
 import pandas as pd
 from datetime import date, datetime
-from typing import Dict, Optional, List, Union
+from typing import Dict, Optional, List, Tuple, Union
 import re
+import time
+import uuid
 from dateutil import parser
 import os
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from locations import get_location_index
+from jobs import JobQueue, WorkerPool, PermanentJobError
+from deadline import Deadline, DeadlineExceeded, current_deadline, with_deadline
+from hedging import HedgeBudget, LatencyTracker, hedged_call
 
 load_dotenv()
 
+# Max in-flight booking/cancellation jobs per upstream provider
+PROVIDER_CONCURRENCY = {"tripadvisor": 2, "transport": 4}
+# Booking state is refreshed from upstream at most once per interval
+RECONCILE_INTERVAL_SECONDS = 300
+
+# Upper bound for one tool call; nested inside the agent turn's deadline when there is one
+TOOL_CALL_TIMEOUT_SECONDS = 20
+# Upper bound for a single HTTP attempt, and the budget used outside any deadline scope
+REQUEST_TIMEOUT_SECONDS = 10
+# Hedged GETs fire a second attempt once the first is slower than this latency percentile
+HEDGE_PERCENTILE = 0.95
+HEDGE_DEFAULT_DELAY_SECONDS = 2.0
+# At most this fraction of requests may be hedged, and none once RapidAPI reports a low quota
+HEDGE_MAX_RATIO = 0.1
+HEDGE_QUOTA_RESERVE = 100
+# Hedges running at once per API type; the hedge pool is sized to hold all of them
+HEDGE_MAX_IN_FLIGHT = 4
+
 class TravelTool(BaseToolSpec):
     spec_functions = ["search_flights", "search_buses", "search_trains", "search_cabs", 
                      "book_transport", "cancel_booking", "get_booking_status"]
@@ -27,22 +52,105 @@ class TravelTool(BaseToolSpec):
             "X-RapidAPI-Host": "tripadvisor-com1.p.rapidapi.com"
         }
 
-    def _make_request(self, endpoint: str, params: Dict, api_type: str = "transport") -> Union[Dict, str]:
-        """Improved request handler with API type selection"""
+        # For bus/train searches and ground transport bookings
+        self.transport_base_url = os.getenv("TRANSPORT_API_URL", "https://transport.opendata.ch/v1").rstrip("/")
+        self.transport_headers = {}
+
+        # Booking provider; without one, bookings and cancellations are mocked locally
+        self.booking_base_url = os.getenv("BOOKING_API_URL", "").rstrip("/")
+        booking_api_key = os.getenv("BOOKING_API_KEY")
+        self.booking_headers = {"Authorization": f"Bearer {booking_api_key}"} if booking_api_key else {}
+
+        # Offline city/airport/station index used to canonicalize user-typed locations
+        self.locations = get_location_index()
+
+        # Bookings and cancellations run on a durable queue so tool calls return immediately
+        self.jobs = JobQueue(os.getenv("TRAVEL_JOBS_DB", "travel_jobs.sqlite3"))
+        self.workers = WorkerPool(
+            self.jobs,
+            handlers={
+                "book": self._run_booking,
+                "cancel": self._run_cancellation,
+                "reconcile": self._run_reconcile
+            },
+            size=int(os.getenv("TRAVEL_JOB_WORKERS", "4")),
+            provider_limits=PROVIDER_CONCURRENCY
+        )
+        self.workers.start()
+
+        # Every attempt runs on a pool so the caller can stop waiting at its deadline. Attempts
+        # abandoned past a deadline hold a thread for at most REQUEST_TIMEOUT_SECONDS.
+        self.request_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("TRAVEL_REQUEST_WORKERS", "32")), thread_name_prefix="travel-request"
+        )
+
+        # Optional hedging of idempotent upstream reads to cut tail latency
+        self.hedge_requests = os.getenv("TRAVEL_HEDGE_REQUESTS", "false").lower() in ("1", "true", "yes")
+        self.latency = {api_type: LatencyTracker() for api_type in ("flight", "transport", "booking")}
+        self.hedge_budgets = {
+            api_type: HedgeBudget(
+                max_ratio=HEDGE_MAX_RATIO, quota_reserve=HEDGE_QUOTA_RESERVE, max_in_flight=HEDGE_MAX_IN_FLIGHT
+            )
+            for api_type in ("flight", "transport", "booking")
+        }
+        self.hedge_executor = ThreadPoolExecutor(
+            max_workers=HEDGE_MAX_IN_FLIGHT * len(self.hedge_budgets), thread_name_prefix="travel-hedge"
+        )
+
+    @staticmethod
+    def _provider_for(transport_type: str) -> str:
+        return "tripadvisor" if transport_type.lower() == "flight" else "transport"
+
+    def _make_request(self, endpoint: str, params: Dict, api_type: str = "transport", method: str = "GET") -> Union[Dict, str]:
+        """Improved request handler with API type selection, bounded by the current deadline"""
         try:
-            base_url = self.flight_base_url if api_type == "flight" else self.transport_base_url
-            headers = self.flight_headers if api_type == "flight" else self.transport_headers
-            
-            response = requests.get(
+            return self._request(endpoint, params, api_type=api_type, method=method)
+        except DeadlineExceeded as e:
+            return f"API request failed: {str(e)} (Status: N/A)"
+        except requests.exceptions.RequestException as e:
+            return f"API request failed: {str(e)} (Status: {getattr(e.response, 'status_code', 'N/A')})"
+
+    def _request(self, endpoint: str, params: Dict, api_type: str = "transport", method: str = "GET") -> Dict:
+        """Like `_make_request`, but raises `requests` errors and `DeadlineExceeded` instead of returning them"""
+        base_url, headers = {
+            "flight": (self.flight_base_url, self.flight_headers),
+            "booking": (self.booking_base_url, self.booking_headers)
+        }.get(api_type, (self.transport_base_url, self.transport_headers))
+        deadline = current_deadline() or Deadline.after(REQUEST_TIMEOUT_SECONDS)
+
+        def attempt(timeout: float) -> Dict:
+            started = time.monotonic()
+            response = requests.request(
+                method,
                 f"{base_url}/{endpoint}",
-                params=params,
-                headers=headers
+                params=params if method == "GET" else None,
+                json=params if method != "GET" else None,
+                headers=headers,
+                timeout=timeout
             )
             response.raise_for_status()
+            self.latency[api_type].record(time.monotonic() - started)
+            quota_remaining = response.headers.get("X-RateLimit-Requests-Remaining")
+            if quota_remaining and quota_remaining.isdigit():
+                self.hedge_budgets[api_type].quota_remaining = int(quota_remaining)
             return response.json()
-        except requests.exceptions.RequestException as e:
-            return f"API request failed: {str(e)} (Status: {e.response.status_code if hasattr(e, 'response') else 'N/A'})"
 
+        # requests' timeout bounds each socket read, not the whole call, so the deadline is
+        # enforced by waiting on the attempt. Only idempotent reads are safe to send twice.
+        hedge_delay = None
+        if self.hedge_requests and method == "GET":
+            hedge_delay = self.latency[api_type].percentile(HEDGE_PERCENTILE) or HEDGE_DEFAULT_DELAY_SECONDS
+        return hedged_call(
+            attempt,
+            self.request_executor,
+            deadline,
+            hedge_delay=hedge_delay,
+            budget=self.hedge_budgets[api_type],
+            per_attempt_timeout=REQUEST_TIMEOUT_SECONDS,
+            hedge_executor=self.hedge_executor
+        )
+
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def search_flights(self, origin: str, destination: str, date: str) -> Union[pd.DataFrame, str]:
         """
         Flight-only search with enhanced error handling
@@ -59,6 +167,10 @@ class TravelTool(BaseToolSpec):
             except ValueError:
                 return "Error: Invalid date format. Please use YYYY-MM-DD"
 
+            # Resolve "New York"/"NYC"/typos to the same IATA code
+            origin = self.locations.canonicalize(origin, mode="flight")
+            destination = self.locations.canonicalize(destination, mode="flight")
+
             # Prepare API request
             params = {
                 "from": origin,
@@ -94,6 +206,7 @@ class TravelTool(BaseToolSpec):
         except Exception as e:
             return f"System error: {str(e)}. Please try again later."
 
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def search_buses(self, origin: str, destination: str, date: str) -> Union[pd.DataFrame, str]:
         """
         Search for bus routes between two locations on a specific date
@@ -111,6 +224,9 @@ class TravelTool(BaseToolSpec):
             departure_date = parser.parse(date).date()
             if departure_date < datetime.now().date():
                 return "Error: Date must be in the future"
+
+            origin = self.locations.canonicalize(origin)
+            destination = self.locations.canonicalize(destination)
                 
             params = {
                 "from": origin,
@@ -139,6 +255,7 @@ class TravelTool(BaseToolSpec):
         except Exception as e:
             return f"Error processing buses: {str(e)}"
 
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def search_trains(self, origin: str, destination: str, date: str) -> Union[pd.DataFrame, str]:
         """
         Search for train routes between two locations on a specific date
@@ -156,6 +273,9 @@ class TravelTool(BaseToolSpec):
             departure_date = parser.parse(date).date()
             if departure_date < datetime.now().date():
                 return "Error: Date must be in the future"
+
+            origin = self.locations.canonicalize(origin)
+            destination = self.locations.canonicalize(destination)
                 
             params = {
                 "from": origin,
@@ -184,6 +304,7 @@ class TravelTool(BaseToolSpec):
         except Exception as e:
             return f"Error processing trains: {str(e)}"
 
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def search_cabs(self, origin: str, destination: str, date: Optional[str] = None) -> Union[pd.DataFrame, str]:
         """
         Search for cab options between two locations
@@ -197,6 +318,9 @@ class TravelTool(BaseToolSpec):
             DataFrame with cab options or error message
         """
         try:
+            origin = self.locations.canonicalize(origin)
+            destination = self.locations.canonicalize(destination)
+
             params = {
                 "pickup": origin,
                 "dropoff": destination,
@@ -226,12 +350,14 @@ class TravelTool(BaseToolSpec):
         except Exception as e:
             return f"Error processing cabs: {str(e)}"
 
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def book_transport(
         self,
         transport_type: str,
         option_id: str,
         passenger_details: Dict,
-        payment_details: Optional[Dict] = None
+        payment_details: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict:
         """
         Book a transport option
@@ -241,9 +367,13 @@ class TravelTool(BaseToolSpec):
             option_id: ID of the selected option
             passenger_details: Dictionary with passenger info
             payment_details: Optional payment information
+            idempotency_key: Optional key; repeating a request with the same key returns the
+                original booking. Defaults to the option and passenger contact, in which case
+                a cancelled booking is not reused and a new one is made.
             
         Returns:
-            Dictionary with booking confirmation or error
+            Dictionary with the queued booking job ID, or error.
+            Use get_booking_status to follow the booking.
         """
         try:
             # Validate inputs
@@ -253,23 +383,57 @@ class TravelTool(BaseToolSpec):
             if not passenger_details.get("name") or not passenger_details.get("contact"):
                 return {"status": "error", "message": "Missing required passenger details"}
                 
-            # Mock booking confirmation
-            booking_id = f"{transport_type[:3]}-{option_id[:4]}-{datetime.now().strftime('%Y%m%d')}"
+            booking_id = f"{transport_type.lower()}-{uuid.uuid4().hex[:12]}"
+            # The default key identifies the live booking; once cancelled, booking again is new
+            retire_terminal_booking = not idempotency_key
+            if not idempotency_key:
+                idempotency_key = f"{transport_type.lower()}:{option_id}:{passenger_details['contact']}"
+
+            job = self.jobs.enqueue(
+                kind="book",
+                payload={
+                    "booking_id": booking_id,
+                    "transport_type": transport_type,
+                    "option_id": option_id,
+                    "passenger_details": passenger_details,
+                    "payment_details": payment_details
+                },
+                job_key=f"book:{idempotency_key}",
+                provider=self._provider_for(transport_type),
+                booking_id=booking_id,
+                requeue_failed=True,
+                retire_terminal_booking=retire_terminal_booking
+            )
+            self.workers.notify()
             
+            # A repeated request gets the booking created the first time
             return {
-                "status": "success",
-                "booking_id": booking_id,
-                "details": {
-                    "transport_type": transport_type,
-                    "passenger": passenger_details,
-                    "booking_time": datetime.now().isoformat(),
-                    "status": "confirmed"
-                }
+                "status": "queued",
+                "job_id": job["id"],
+                "booking_id": job["booking_id"],
+                "message": "Booking submitted. Use get_booking_status to check confirmation."
             }
             
         except Exception as e:
             return {"status": "error", "message": f"Booking failed: {str(e)}"}
 
+    def _run_booking(self, payload: Dict) -> Tuple[Dict, str]:
+        """Worker handler for queued bookings; mocked unless BOOKING_API_URL is configured"""
+        details = {
+            "transport_type": payload["transport_type"],
+            "option_id": payload["option_id"],
+            "passenger": payload["passenger_details"],
+            "booking_time": datetime.now().isoformat(),
+            "status": "confirmed",
+            # Only bookings made with the provider can be cancelled or refreshed there
+            "remote": bool(self.booking_base_url)
+        }
+        if self.booking_base_url:
+            result = self._request_for_job(endpoint="bookings", params=payload, api_type="booking", method="POST")
+            details["status"] = result.get("status", "confirmed")
+        # Mock booking confirmation otherwise
+        return details, details["status"]
+
     def _parse_date(self, date_str: str) -> Union[date, str]:
         """Helper method to parse and validate dates"""
         try:
@@ -280,6 +444,7 @@ class TravelTool(BaseToolSpec):
         except ValueError:
             return "Error: Invalid date format. Please use YYYY-MM-DD"
 
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def cancel_booking(self, booking_id: str, reason: Optional[str] = None) -> Dict:
         """
         Cancel a transport booking
@@ -289,11 +454,12 @@ class TravelTool(BaseToolSpec):
             reason: Optional reason for cancellation
             
         Returns:
-            Dictionary with cancellation status and details
+            Dictionary with the queued cancellation job ID, or error.
+            Use get_booking_status to follow the cancellation.
         """
         try:
             # Validate booking ID format
-            if not re.match(r'^(flight|bus|train|cab)-\w{4}-\d{8}$', booking_id):
+            if not re.match(r'^(flight|bus|train|cab)-[0-9a-f]{12}$', booking_id):
                 return {
                     "status": "error",
                     "message": "Invalid booking ID format"
@@ -307,37 +473,22 @@ class TravelTool(BaseToolSpec):
             if reason:
                 payload["reason"] = reason
 
-            # Make cancellation request
-            result = self._make_request(
-                endpoint=f"bookings/{booking_id}/cancel",
-                params=payload,
-                method="POST"
+            job = self.jobs.enqueue(
+                kind="cancel",
+                payload=payload,
+                job_key=f"cancel:{booking_id}",
+                provider=self._provider_for(booking_id.split("-")[0]),
+                booking_id=booking_id,
+                requeue_failed=True
             )
+            self.workers.notify()
 
-            if isinstance(result, str):
-                return {
-                    "status": "error",
-                    "message": result
-                }
-
-            # Check if cancellation was successful
-            if result.get("status") == "cancelled":
-                return {
-                    "status": "success",
-                    "message": "Booking cancelled successfully",
-                    "details": {
-                        "booking_id": booking_id,
-                        "cancellation_time": datetime.now().isoformat(),
-                        "refund_status": result.get("refund_status", "pending"),
-                        "refund_amount": result.get("refund_amount")
-                    }
-                }
-            else:
-                return {
-                    "status": "error",
-                    "message": "Failed to cancel booking",
-                    "details": result
-                }
+            return {
+                "status": "queued",
+                "job_id": job["id"],
+                "booking_id": booking_id,
+                "message": "Cancellation submitted. Use get_booking_status to check progress."
+            }
 
         except Exception as e:
             return {
@@ -345,42 +496,129 @@ class TravelTool(BaseToolSpec):
                 "message": f"Cancellation failed: {str(e)}"
             }
 
+    def _request_for_job(self, endpoint: str, params: Dict, api_type: str, method: str = "GET") -> Dict:
+        """`_request` for job handlers: client errors fail the job instead of being retried"""
+        try:
+            return self._request(endpoint, params, api_type=api_type, method=method)
+        except requests.exceptions.HTTPError as e:
+            status = getattr(e.response, "status_code", None)
+            if status is not None and 400 <= status < 500 and status != 429:
+                raise PermanentJobError(f"Upstream rejected {method} {endpoint} (Status: {status})") from e
+            raise
+
+    def _run_cancellation(self, payload: Dict) -> Tuple[Dict, str]:
+        """Worker handler for queued cancellations; transient upstream errors are retried by the queue"""
+        booking_id = payload["booking_id"]
+        booking = self.jobs.get_booking(booking_id)
+        if booking is None:
+            raise PermanentJobError("Booking was never confirmed, nothing to cancel")
+
+        if not booking["details"].get("remote"):
+            # Mock cancellation for bookings that only exist locally
+            return {
+                "booking_id": booking_id,
+                "cancellation_time": datetime.now().isoformat(),
+                "refund_status": "not_applicable",
+                "refund_amount": None
+            }, "cancelled"
+
+        result = self._request_for_job(
+            endpoint=f"bookings/{booking_id}/cancel",
+            params=payload,
+            api_type="booking",
+            method="POST"
+        )
+
+        # Check if cancellation was successful
+        if result.get("status") != "cancelled":
+            raise PermanentJobError(f"Failed to cancel booking: {result}")
+
+        return {
+            "booking_id": booking_id,
+            "cancellation_time": datetime.now().isoformat(),
+            "refund_status": result.get("refund_status", "pending"),
+            "refund_amount": result.get("refund_amount")
+        }, "cancelled"
+
+    def _run_reconcile(self, payload: Dict) -> Tuple[Dict, str]:
+        """Worker handler that refreshes local booking state from the booking provider"""
+        result = self._request_for_job(
+            endpoint=f"bookings/{payload['booking_id']}",
+            params={},
+            api_type="booking"
+        )
+
+        return {
+            "status": result.get("status"),
+            "transport_type": result.get("transport_type"),
+            "passenger": result.get("passenger"),
+            "booking_time": result.get("booking_time"),
+            "journey_details": result.get("journey_details"),
+            "remote": True
+        }, result.get("status") or "unknown"
+
+    @with_deadline(TOOL_CALL_TIMEOUT_SECONDS)
     def get_booking_status(self, booking_id: str) -> Dict:
         """
         Get the current status of a booking
         
         Args:
-            booking_id: ID of the booking to check
+            booking_id: ID of the booking, or job ID returned by book_transport/cancel_booking
             
         Returns:
             Dictionary with booking status and details
         """
         try:
-            result = self._make_request(
-                endpoint=f"bookings/{booking_id}",
-                params={}
-            )
+            job = self.jobs.get(booking_id) or self.jobs.latest_for_booking(booking_id, kinds=["book", "cancel"])
+            if job is not None:
+                booking_id = job["booking_id"]
+            booking = self.jobs.get_booking(booking_id)
 
-            if isinstance(result, str):
+            if job is None and booking is None:
                 return {
                     "status": "error",
-                    "message": result
+                    "message": f"Unknown booking: {booking_id}"
                 }
 
+            if booking is not None and booking["status"] == "confirmed" and booking["details"].get("remote"):
+                # Refresh from the provider in the background; the key limits this to once per interval
+                self.jobs.enqueue(
+                    kind="reconcile",
+                    payload={"booking_id": booking_id},
+                    job_key=f"reconcile:{booking_id}:{int(time.time() // RECONCILE_INTERVAL_SECONDS)}",
+                    provider=self._provider_for(booking_id.split("-")[0]),
+                    booking_id=booking_id,
+                    max_attempts=1
+                )
+                self.workers.notify()
+
+            details = dict(booking["details"]) if booking else {}
+            # The booking's own state; until the booking job has succeeded there is none recorded
+            if booking is not None:
+                details["status"] = booking["status"]
+            else:
+                details["status"] = "failed" if job["kind"] == "book" and job["status"] == "failed" else "pending"
+            # Outcome of the latest booking/cancellation request, e.g. "cancellation_failed"
+            if job is not None:
+                operation = {"book": "booking", "cancel": "cancellation"}.get(job["kind"], job["kind"])
+                outcome = job["status"] if job["status"] in ("succeeded", "failed") else "pending"
+                details["last_operation"] = f"{operation}_{outcome}"
+            details["job"] = {
+                "id": job["id"],
+                "kind": job["kind"],
+                "status": job["status"],
+                "attempts": job["attempts"],
+                "error": job["error"]
+            } if job else None
+
             return {
                 "status": "success",
                 "booking_id": booking_id,
-                "details": {
-                    "status": result.get("status"),
-                    "transport_type": result.get("transport_type"),
-                    "passenger": result.get("passenger"),
-                    "booking_time": result.get("booking_time"),
-                    "journey_details": result.get("journey_details")
-                }
+                "details": details
             }
 
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Failed to get booking status: {str(e)}"
-            }
\ No newline at end of file
+            }
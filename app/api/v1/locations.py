@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Query
+from app.agents.travel.locations import get_location_index
+from app.schemas.location import AutocompleteResponse
+
+router = APIRouter()
+
+
+@router.get("/autocomplete", response_model=AutocompleteResponse)
+def autocomplete_locations(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=10)
+):
+    """
+    Suggest cities, airports and stations for a partially typed query, tolerating typos
+    """
+    results = get_location_index().autocomplete(q, limit=limit)
+    return {"query": q, "results": [location.to_dict() for location in results]}
@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1 import auth
 from app.api.v1 import user
+from app.api.v1 import locations
 
 app = FastAPI(
     title="Travel Planning AI Agent",
@@ -21,6 +22,7 @@ app.add_middleware(
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["authentication"])
 app.include_router(user.router, prefix="/user", tags=["users"])
+app.include_router(locations.router, prefix="/locations", tags=["locations"])
 
 @app.get("/")
 async def root():
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+
+class LocationResponse(BaseModel):
+    code: str
+    name: str
+    type: str
+    country: Optional[str] = None
+    city: Optional[str] = None
+
+class AutocompleteResponse(BaseModel):
+    query: str
+    results: List[LocationResponse]
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, current_deadline, deadline_scope
+from hedging import HedgeBudget, LatencyTracker, hedged_call
+
+
+@pytest.fixture
+def executors():
+    primary, hedges = ThreadPoolExecutor(4), ThreadPoolExecutor(2)
+    yield primary, hedges
+    primary.shutdown(wait=False)
+    hedges.shutdown(wait=False)
+
+
+def slow_then_fast(first_delay=1.0, second_delay=0.01):
+    calls = []
+    lock = threading.Lock()
+
+    def attempt(timeout):
+        with lock:
+            calls.append(timeout)
+            delay = first_delay if len(calls) == 1 else second_delay
+        time.sleep(delay)
+        return len(calls)
+    return attempt, calls
+
+
+def test_nested_deadline_scope_only_shortens():
+    with deadline_scope(0.5):
+        with deadline_scope(10):
+            assert current_deadline().remaining() <= 0.5
+    assert current_deadline() is None
+
+
+def test_hedge_wins_when_primary_is_slow(executors):
+    attempt, calls = slow_then_fast()
+    started = time.monotonic()
+    result = hedged_call(attempt, executors[0], Deadline.after(2), 0.05, HedgeBudget(), 10, executors[1])
+    assert result == 2
+    assert len(calls) == 2
+    assert time.monotonic() - started < 0.5
+
+
+def test_no_hedge_without_delay_or_budget(executors):
+    attempt, calls = slow_then_fast(first_delay=0.1)
+    assert hedged_call(attempt, executors[0], Deadline.after(2)) == 1
+    attempt, calls = slow_then_fast(first_delay=0.1)
+    exhausted = HedgeBudget(max_ratio=0, burst=0)
+    assert hedged_call(attempt, executors[0], Deadline.after(2), 0.01, exhausted, 10, executors[1]) == 1
+    assert len(calls) == 1
+
+
+def test_low_quota_disables_hedging():
+    budget = HedgeBudget(quota_reserve=100)
+    budget.quota_remaining = 99
+    assert not budget.try_acquire()
+
+
+def test_in_flight_hedges_are_capped_and_released():
+    budget = HedgeBudget(burst=10, max_in_flight=1)
+    assert budget.try_acquire()
+    assert not budget.try_acquire()
+    budget.release()
+    assert budget.try_acquire()
+
+
+def test_deadline_bounds_unhedged_slow_attempt(executors):
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        hedged_call(lambda timeout: time.sleep(2), executors[0], Deadline.after(0.1), per_attempt_timeout=10)
+    assert time.monotonic() - started < 0.5
+
+
+def test_attempt_error_is_raised(executors):
+    def boom(timeout):
+        raise ValueError("upstream down")
+    with pytest.raises(ValueError, match="upstream down"):
+        hedged_call(boom, executors[0], Deadline.after(1), 0.05, HedgeBudget())
+
+
+def test_latency_percentile_needs_min_samples():
+    tracker = LatencyTracker(min_samples=3)
+    tracker.record(0.1)
+    tracker.record(0.2)
+    assert tracker.percentile(0.95) is None
+    tracker.record(0.3)
+    assert tracker.percentile(0.95) == 0.3
@@ -0,0 +1,142 @@
+import time
+
+import pytest
+
+import jobs
+from jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "BACKOFF_BASE_SECONDS", 0.0)
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_enqueue_is_idempotent_by_key(queue):
+    first = queue.enqueue("book", {"n": 1}, "k", "p", booking_id="b")
+    second = queue.enqueue("book", {"n": 2}, "k", "p", booking_id="b")
+    assert second["id"] == first["id"]
+    assert second["payload"] == {"n": 1}
+
+
+def test_claim_runs_jobs_for_a_booking_in_order(queue):
+    queue.enqueue("book", {}, "book", "p", booking_id="b")
+    queue.enqueue("cancel", {}, "cancel", "p", booking_id="b")
+
+    book = queue.claim({"p": 5})
+    assert book["kind"] == "book"
+    # The cancellation waits while the booking is running...
+    assert queue.claim({"p": 5}) is None
+
+    # ...and while it is queued again for a retry
+    queue.fail(book, "transient")
+    assert queue.claim({"p": 5})["kind"] == "book"
+    assert queue.claim({"p": 5}) is None
+
+
+def test_claim_respects_provider_limits(queue):
+    for i in range(3):
+        queue.enqueue("book", {}, f"k{i}", "p", booking_id=f"b{i}")
+    assert queue.claim({"p": 2}) is not None
+    assert queue.claim({"p": 2}) is not None
+    assert queue.claim({"p": 2}) is None
+
+
+def test_fail_retries_until_attempts_are_exhausted(queue):
+    queue.enqueue("book", {}, "k", "p", max_attempts=2)
+    queue.fail(queue.claim({"p": 1}), "boom")
+    job = queue.claim({"p": 1})
+    assert job["attempts"] == 2
+    queue.fail(job, "boom")
+    assert queue.get(job["id"])["status"] == FAILED
+
+
+def test_requeue_failed_is_opt_in(queue):
+    job = queue.enqueue("reconcile", {}, "k", "p", max_attempts=1)
+    queue.fail(queue.claim({"p": 1}), "boom")
+
+    assert queue.enqueue("reconcile", {}, "k", "p")["status"] == FAILED
+    requeued = queue.enqueue("reconcile", {}, "k", "p", requeue_failed=True)
+    assert requeued["id"] == job["id"]
+    assert requeued["status"] == QUEUED
+    assert requeued["attempts"] == 0
+
+
+def test_expired_lease_is_requeued_on_claim(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.05)
+    queue.enqueue("book", {}, "book", "p", booking_id="b")
+    queue.enqueue("cancel", {}, "cancel", "p", booking_id="b")
+    abandoned = queue.claim({"p": 1})
+
+    time.sleep(0.1)
+    reclaimed = queue.claim({"p": 1})
+    assert reclaimed["id"] == abandoned["id"]
+    assert reclaimed["attempts"] == 2
+
+    # The abandoned worker can no longer complete the job it lost
+    queue.complete(abandoned, {"status": "confirmed"}, "confirmed")
+    assert queue.get(abandoned["id"])["status"] == RUNNING
+    assert queue.get_booking("b") is None
+
+    queue.complete(reclaimed, {"status": "confirmed"}, "confirmed")
+    assert queue.claim({"p": 1})["kind"] == "cancel"
+
+
+def test_renewed_lease_is_not_requeued(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.2)
+    queue.enqueue("book", {}, "k", "p")
+    job = queue.claim({"p": 1})
+    for _ in range(3):
+        time.sleep(0.1)
+        queue.renew_leases([job])
+    assert queue.claim({"p": 1}) is None
+    assert queue.get(job["id"])["status"] == RUNNING
+
+
+def test_cancelled_booking_is_not_overwritten(queue):
+    queue.enqueue("cancel", {}, "cancel", "p", booking_id="b")
+    queue.complete(queue.claim({"p": 1}), {}, "cancelled")
+    queue.enqueue("reconcile", {}, "reconcile", "p", booking_id="b")
+    reconcile = queue.claim({"p": 1})
+    queue.complete(reconcile, {}, "confirmed")
+    assert queue.get(reconcile["id"])["status"] == SUCCEEDED
+    assert queue.get_booking("b")["status"] == "cancelled"
+
+
+def test_worker_pool_recovers_jobs_left_running(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path, lease_seconds=0.1)
+    queue.enqueue("book", {}, "k", "p", booking_id="b")
+    queue.claim({"p": 1})  # Simulates a worker killed mid-job
+
+    pool = jobs.WorkerPool(
+        JobQueue(path, lease_seconds=0.1),
+        handlers={"book": lambda payload: ({"status": "confirmed"}, "confirmed")},
+        size=1,
+        provider_limits={"p": 1},
+        poll_interval=0.02
+    )
+    pool.start()
+    try:
+        deadline = time.monotonic() + 2
+        while queue.get_booking("b") is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        pool.stop(timeout=1)
+    assert queue.get_booking("b")["status"] == "confirmed"
+
+
+def test_rebooking_reuses_live_booking_but_not_cancelled_one(queue):
+    first = queue.enqueue("book", {}, "book:opt:a", "p", booking_id="b1", retire_terminal_booking=True)
+    queue.complete(queue.claim({"p": 1}), {}, "confirmed")
+    again = queue.enqueue("book", {}, "book:opt:a", "p", booking_id="b2", retire_terminal_booking=True)
+    assert again["id"] == first["id"]
+    assert again["booking_id"] == "b1"
+
+    queue.enqueue("cancel", {}, "cancel:b1", "p", booking_id="b1")
+    queue.complete(queue.claim({"p": 1}), {}, "cancelled")
+    rebooked = queue.enqueue("book", {}, "book:opt:a", "p", booking_id="b3", retire_terminal_booking=True)
+    assert rebooked["id"] != first["id"]
+    assert rebooked["booking_id"] == "b3"
+    assert rebooked["status"] == QUEUED
+    assert queue.get(first["id"])["status"] == SUCCEEDED
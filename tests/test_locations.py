@@ -0,0 +1,64 @@
+import pytest
+
+from locations import LocationIndex, edit_distance
+
+ENTRIES = [
+    {"code": "NYC", "name": "New York", "type": "city", "country": "US", "aliases": ["New York City"], "rank": 100},
+    {"code": "JFK", "name": "John F. Kennedy International Airport", "type": "airport", "city": "NYC",
+     "country": "US", "aliases": ["Kennedy"], "rank": 99},
+    {"code": "NYP", "name": "New York Penn Station", "type": "station", "city": "NYC", "country": "US",
+     "aliases": [], "rank": 95},
+    {"code": "DXB", "name": "Dubai", "type": "city", "country": "AE", "aliases": [], "rank": 92},
+    {"code": "BLR", "name": "Bengaluru", "type": "city", "country": "IN", "aliases": ["Bangalore"], "rank": 93},
+    {"code": "GVA", "name": "Geneva", "type": "city", "country": "CH", "aliases": ["Genève"], "rank": 82},
+]
+
+
+@pytest.fixture
+def index():
+    return LocationIndex(ENTRIES)
+
+
+@pytest.mark.parametrize("query", ["New York", "new york city", "NYC", " nyc "])
+def test_exact_names_aliases_and_codes_canonicalize(index, query):
+    assert index.canonicalize(query, mode="flight") == "NYC"
+    assert index.canonicalize(query) == "New York"
+
+
+def test_airports_and_stations_map_per_mode(index):
+    assert index.canonicalize("Kennedy", mode="flight") == "JFK"
+    assert index.canonicalize("Kennedy") == "New York"
+    assert index.canonicalize("New York Penn Station", mode="flight") == "NYC"
+    assert index.canonicalize("Genève", mode="flight") == "GVA"
+
+
+@pytest.mark.parametrize("query", ["Dublin", "Genoa", "Gent", "Pariss"])
+def test_unknown_places_pass_through_unchanged(index, query):
+    assert index.canonicalize(query, mode="flight") == query
+    assert index.canonicalize(query) == query
+
+
+def test_single_typo_in_long_name_is_corrected(index):
+    assert index.canonicalize("new yrok", mode="flight") == "NYC"
+    assert index.canonicalize("Banglore", mode="flight") == "BLR"
+
+
+def test_two_typos_are_not_corrected(index):
+    assert index.canonicalize("nwe yrok", mode="flight") == "nwe yrok"
+
+
+def test_autocomplete_suggests_prefixes_then_fuzzy_matches(index):
+    assert [loc.code for loc in index.autocomplete("new")][:2] == ["NYC", "NYP"]
+    assert [loc.code for loc in index.autocomplete("Dubia")] == ["DXB"]
+    assert index.autocomplete("") == []
+
+
+@pytest.mark.parametrize("a, b, limit, expected", [
+    ("kitten", "sitting", 5, 3),
+    ("kitten", "sitting", 2, 3),
+    ("new yrok", "new york", 2, 1),
+    ("abc", "abc", 1, 0),
+    ("", "ab", 2, 2),
+])
+def test_edit_distance_is_capped_at_limit_plus_one(a, b, limit, expected):
+    assert edit_distance(a, b, limit) == expected